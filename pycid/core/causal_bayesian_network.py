@@ -1,12 +1,13 @@
 from __future__ import annotations
 
 import collections
-from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Set, Tuple, Union
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Mapping, Optional, Set, Tuple, Union
 
 import matplotlib.pyplot as plt
 import networkx as nx
 import numpy as np
-from pgmpy.factors.discrete import TabularCPD
+from pgmpy.factors.continuous import ContinuousFactor
+from pgmpy.factors.discrete import DiscreteFactor, TabularCPD
 from pgmpy.inference.ExactInference import BeliefPropagation
 from pgmpy.models import BayesianNetwork
 from pgmpy.sampling import BayesianModelSampling
@@ -14,6 +15,7 @@ from pgmpy.sampling import BayesianModelSampling
 from pycid.core.cpd import ConstantCPD, Outcome, ParentsNotReadyException, StochasticFunctionCPD
 
 Relationship = Union[TabularCPD, Dict[Outcome, float], Callable[..., Union[Outcome, Dict[Outcome, float]]]]
+QueryKey = Tuple[Tuple[str, ...], frozenset, frozenset]
 
 
 class CausalBayesianNetwork(BayesianNetwork):
@@ -37,36 +39,39 @@ class CausalBayesianNetwork(BayesianNetwork):
 
         def __setitem__(self, variable: str, relationship: Relationship) -> None:
 
+            self.cbn._clear_query_cache()
+
             # Update the keys
             if variable in self.keys():
-                self.__delitem__(variable)
+                super().__delitem__(variable)
             super().__setitem__(variable, relationship)
 
-            # Try obtaining a TabularCPD from the relationship. If it fails, do nothing
+            # Try obtaining a TabularCPD from the relationship. If it fails, remove any previous CPD
             try:
                 cpd = self.to_tabular_cpd(variable, relationship)
             except ParentsNotReadyException:
+                self.cbn._remove_cpd(variable)
                 return
 
             # add cpd to BayesianNetwork, and update domain dictionary
-            BayesianNetwork.add_cpds(self.cbn, cpd)
+            self.cbn._set_cpd(cpd)
             old_domain = self.domain.get(variable, None)
             self.domain[variable] = cpd.state_names[variable]
 
-            # if the domain has changed, update all descendants, and sync the state_names
+            # if the domain has changed, update all descendants, and sync the state_names.
+            # Otherwise, the other CPDs already know all domains, and only the new CPD needs to be informed.
             if not (old_domain and old_domain == self.domain[variable]):
                 for child in self.cbn.get_children(variable):
                     if child in self.keys():
                         self.__setitem__(child, self[child])  # type: ignore
-
-            self.sync_state_names()
+                self.sync_state_names()
+            else:
+                cpd.store_state_names(None, None, dict(self.domain))
 
         def __delitem__(self, variable: str) -> None:
+            self.cbn._clear_query_cache()
             super().__delitem__(variable)
-            try:
-                BayesianNetwork.remove_cpds(self.cbn, variable)
-            except ValueError:
-                pass
+            self.cbn._remove_cpd(variable)
 
         def sync_state_names(self) -> None:
             """Inform each CPD about the domains of other variables"""
@@ -81,6 +86,12 @@ class CausalBayesianNetwork(BayesianNetwork):
             elif isinstance(relationship, Mapping):
                 return ConstantCPD(variable, relationship, self.cbn)
 
+    # Queries on models with at most this many nodes skip BeliefPropagation, see query()
+    MAX_NODES_FOR_VARIABLE_ELIMINATION = 12
+
+    # Maximum number of query results to memoize, the least recently used are evicted first
+    QUERY_CACHE_SIZE = 1024
+
     def __init__(self, edges: Iterable[Tuple[str, str]] = None, **kwargs: Any):
         """Initialize a Causal Bayesian Network
 
@@ -89,16 +100,118 @@ class CausalBayesianNetwork(BayesianNetwork):
         edges: A set of directed edges. Each is a pair of node labels (tail, head).
         """
         self.model = self.Model(self)
+        # Memoized query results, keyed by (query, context, intervention).
+        # Cleared whenever the graph or a CPD changes, including when self.cpds is modified directly.
+        self._query_cache: collections.OrderedDict[QueryKey, DiscreteFactor] = collections.OrderedDict()
+        self._bp: Optional[BeliefPropagation] = None
+        # The CPDs the cached results were computed from
+        self._query_cache_cpds: Optional[List[TabularCPD]] = None
+        # Position of each variable's CPD in self.cpds, to avoid pgmpy's linear scans
+        self._cpd_index: Dict[str, int] = {}
+        # Topological order and ancestor sets, computed lazily and cleared whenever the graph changes
+        self._topological_order: Optional[List[str]] = None
+        self._ancestors: Dict[str, FrozenSet[str]] = {}
         super().__init__(ebunch=edges, **kwargs)
 
+    def _clear_query_cache(self) -> None:
+        self._query_cache = collections.OrderedDict()
+        self._bp = None
+        self._query_cache_cpds = None
+
+    def _validate_query_cache(self) -> None:
+        """Clear the query cache if the CPDs have changed since the cached results were computed"""
+        cpds = self._query_cache_cpds
+        if cpds is None or len(cpds) != len(self.cpds) or any(a is not b for a, b in zip(cpds, self.cpds)):
+            self._clear_query_cache()
+            self._query_cache_cpds = list(self.cpds)
+
+    def _clear_graph_caches(self) -> None:
+        self._clear_query_cache()
+        self._topological_order = None
+        self._ancestors = {}
+
+    def _get_topological_order(self) -> List[str]:
+        """Return a topological order of all the nodes in the graph"""
+        if self._topological_order is None:
+            self._topological_order = list(nx.topological_sort(self))
+        return list(self._topological_order)
+
+    def _get_ancestors_of(self, nodes: Union[str, Iterable[str]]) -> Set[str]:
+        """Return the ancestors of the given nodes, including the nodes themselves"""
+        if not isinstance(nodes, (list, tuple)):
+            nodes = [nodes]  # type: ignore
+        ancestors: Set[str] = set()
+        for node in nodes:
+            if node not in self._ancestors:
+                if node not in self.nodes:
+                    raise ValueError(f"Node {node} not in graph")
+                self._ancestors[node] = frozenset(nx.ancestors(self, node)) | {node}
+            ancestors.update(self._ancestors[node])
+        return ancestors
+
+    def _get_cpd_index(self, variable: str) -> Optional[int]:
+        """Return the position of the CPD of variable in self.cpds, or None if it has no CPD"""
+        idx = self._cpd_index.get(variable)
+        if (idx is None and len(self._cpd_index) != len(self.cpds)) or (
+            idx is not None and (idx >= len(self.cpds) or self.cpds[idx].variable != variable)
+        ):
+            # the index is stale, e.g. because self.cpds was modified directly
+            self._cpd_index = {cpd.variable: i for i, cpd in enumerate(self.cpds)}
+            idx = self._cpd_index.get(variable)
+        return idx
+
+    def _set_cpd(self, cpd: TabularCPD) -> None:
+        """Add the CPD to self.cpds, replacing any previous CPD for the same variable"""
+        if not isinstance(cpd, (TabularCPD, ContinuousFactor)):
+            raise ValueError("Only TabularCPD or ContinuousFactor can be added.")
+        if any(var not in self for var in cpd.scope()):
+            raise ValueError("CPD defined on variable not in the model", cpd)
+        idx = self._get_cpd_index(cpd.variable)
+        if idx is None:
+            self._cpd_index[cpd.variable] = len(self.cpds)
+            self.cpds.append(cpd)
+        else:
+            self.cpds[idx] = cpd
+
+    def _remove_cpd(self, variable: str) -> None:
+        """Remove the CPD of variable from self.cpds, if there is one"""
+        idx = self._get_cpd_index(variable)
+        if idx is not None:
+            del self.cpds[idx]
+            self._cpd_index = {cpd.variable: i for i, cpd in enumerate(self.cpds)}
+
+    def get_cpds(self, node: Optional[str] = None) -> Any:
+        """Return the CPD of node, or a list of all CPDs if node is not specified"""
+        if node is None or node not in self:
+            return super().get_cpds(node)
+        idx = self._get_cpd_index(node)
+        return self.cpds[idx] if idx is not None else None
+
+    def add_node(self, node: str, **kwargs: Any) -> None:
+        """adds a node to the CBN"""
+        self._clear_graph_caches()
+        super().add_node(node, **kwargs)
+
+    def remove_node(self, node: str) -> None:
+        """removes a node, and its CPD, from the CBN"""
+        self._clear_graph_caches()
+        super().remove_node(node)
+
     def remove_edge(self, u: str, v: str) -> None:
         """removes an edge u to v that exists from the CBN"""
+        self._clear_graph_caches()
         super().remove_edge(u, v)
         if v in self.model and isinstance(self.get_cpds(v), ConstantCPD):
             self.model[v] = self.model[v]
 
+    def remove_edges_from(self, ebunch: Iterable[Tuple[str, str]]) -> None:
+        """removes the given edges from the CBN"""
+        self._clear_graph_caches()
+        super().remove_edges_from(ebunch)
+
     def add_edge(self, u: str, v: str, **kwargs: Any) -> None:
         """adds an edge from u to v to the CBN"""
+        self._clear_graph_caches()
         super().add_edge(u, v, **kwargs)
         if v in self.model and isinstance(self.get_cpds(v), ConstantCPD):
             self.model[v] = self.model[v]
@@ -124,9 +237,9 @@ class CausalBayesianNetwork(BayesianNetwork):
         """
         for node in self:
             if self.get_parents(node):
-                for probability in self.get_cpds(node).values.flatten():
-                    if not (np.isclose(probability, 0) or np.isclose(probability, 1)):
-                        return False
+                probabilities = self.get_cpds(node).values
+                if not (np.isclose(probabilities, 0) | np.isclose(probabilities, 1)).all():
+                    return False
         return True
 
     def query(
@@ -145,10 +258,17 @@ class CausalBayesianNetwork(BayesianNetwork):
 
         intervention: Interventions to apply. A dictionary mapping node => outcome.
         """
+        query = list(query)
         for variable, outcome in context.items():
             if outcome not in self.model.domain[variable]:
                 raise ValueError(f"The outcome {outcome} is not in the domain of {variable}")
 
+        key = (tuple(query), frozenset(context.items()), frozenset(intervention.items() if intervention else ()))
+        self._validate_query_cache()
+        if key in self._query_cache:
+            self._query_cache.move_to_end(key)
+            return self._query_cache[key].copy()
+
         # Apply the intervention (if any)
         if intervention:
             cbn = self.copy()
@@ -161,19 +281,75 @@ class CausalBayesianNetwork(BayesianNetwork):
         connected_nodes: Set[str] = set().union(  # type: ignore
             *[nx.node_connected_component(undirected, var) for var in query]
         )
-        context = {k: v for k, v in context.items() if k in connected_nodes}
-        for node in list(cbn.nodes):
-            if node not in connected_nodes:
-                cbn.remove_node(node)
-        if not nx.is_connected(cbn.to_undirected()):
+        if not nx.is_connected(undirected.subgraph(connected_nodes)):
             raise ValueError(f"query {query} contains nodes in disconnected components")
+        context = {k: v for k, v in context.items() if k in connected_nodes}
 
-        bp = BeliefPropagation(cbn)
-
+        # For small models, building the junction tree of BeliefPropagation dominates the cost of the query
+        if len(cbn.nodes) <= self.MAX_NODES_FOR_VARIABLE_ELIMINATION:
+            factor = cbn._variable_elimination(query, context)
+        else:
+            disconnected_nodes = [node for node in cbn.nodes if node not in connected_nodes]
+            if disconnected_nodes:
+                if cbn is self:
+                    cbn = self.copy()  # only copy when necessary, and never remove nodes from self
+                cbn.remove_nodes_from(disconnected_nodes)
+
+            # BeliefPropagation can be reused for queries with different contexts, as long as the model is unchanged
+            if cbn is not self:
+                bp = BeliefPropagation(cbn._to_bayesian_network())
+            elif self._bp is None:
+                bp = self._bp = BeliefPropagation(self._to_bayesian_network())
+            else:
+                bp = self._bp
+
+            with np.errstate(invalid="ignore"):  # Suppress numpy warnings for 0/0
+                factor = bp.query(query, context, show_progress=False)
+        self._query_cache[key] = factor
+        if len(self._query_cache) > self.QUERY_CACHE_SIZE:
+            self._query_cache.popitem(last=False)
+        return factor.copy()
+
+    def _variable_elimination(self, query: List[str], context: Dict[str, Outcome]) -> DiscreteFactor:
+        """Return P(query|context), computed by multiplying together the CPDs of the query and context
+        variables and their ancestors, and summing out all other variables with a single np.einsum.
+        """
+        overlap = set(query).intersection(context)
+        if overlap:
+            raise ValueError(f"Can't have the same variables in both query and context. Found in both: {overlap}")
+
+        relevant = list(self._get_ancestors_of(query + list(context)))
+        index = {variable: i for i, variable in enumerate(relevant)}
+        operands: List[Any] = []
+        for variable in relevant:
+            cpd = self.get_cpds(variable)
+            if cpd is None:
+                raise ValueError(f"No CPD associated with {variable}")
+            # Condition on the context by selecting the observed outcome along the corresponding axis
+            values = cpd.values
+            for axis in reversed(range(len(cpd.variables))):
+                if cpd.variables[axis] in context:
+                    values = values.take(cpd.name_to_no[cpd.variables[axis]][context[cpd.variables[axis]]], axis=axis)
+            operands += [values, [index[v] for v in cpd.variables if v not in context]]
+
+        values = np.einsum(*operands, [index[v] for v in query], optimize="greedy")
         with np.errstate(invalid="ignore"):  # Suppress numpy warnings for 0/0
-            factor = bp.query(query, context, show_progress=False)
-            factor = bp.query(query, context, show_progress=False)
-        return factor
+            values = values / values.sum()
+        return DiscreteFactor(
+            query, values.shape, values, state_names={variable: self.model.domain[variable] for variable in query}
+        )
+
+    def _to_bayesian_network(self) -> BayesianNetwork:
+        """Return a plain pgmpy BayesianNetwork with the same graph and (plain TabularCPD) CPDs.
+
+        pgmpy's inference copies the model on every query, which is cheap for a plain BayesianNetwork,
+        but would re-evaluate every StochasticFunctionCPD of a CausalBayesianNetwork.
+        """
+        bn = BayesianNetwork()
+        bn.add_nodes_from(self.nodes)
+        bn.add_edges_from(self.edges)
+        bn.add_cpds(*[TabularCPD.copy(cpd) for cpd in self.get_cpds()])
+        return bn
 
     def intervene(self, intervention: Dict[str, Outcome]) -> None:
         """Given a dictionary of interventions, replace the CPDs for the relevant nodes.
@@ -210,22 +386,24 @@ class CausalBayesianNetwork(BayesianNetwork):
         intervention: Interventions to apply. A dictionary mapping node => value.
         """
         factor = self.query(variables, context, intervention=intervention)
-        factor.normalize()  # make probs add to one
-
-        ev = np.array([0.0 for _ in factor.variables])
-        for idx, prob in np.ndenumerate(factor.values):  # type: ignore
-            # idx contains the information about the value each variable takes
-            # we use state_names to convert index into the actual value of the variable
-            ev += prob * np.array(  # type: ignore
-                [factor.state_names[variable][idx[var_idx]] for var_idx, variable in enumerate(factor.variables)]
-            )
-            if np.isnan(ev).any():
-                raise RuntimeError(
-                    "query {} | {} generated Nan from idx: {}, prob: {}, \
-                                consider imputing a random decision".format(
-                        variables, context, idx, prob
-                    )
+
+        # Sum out all other variables, then weight the states of each variable by their (unnormalized)
+        # probability, and divide by the total mass once at the end rather than normalizing the factor
+        ev = np.array(
+            [
+                np.dot(
+                    np.asarray(factor.state_names[variable], dtype=float),
+                    factor.values.sum(axis=tuple(j for j in range(len(factor.variables)) if j != i)),
                 )
+                for i, variable in enumerate(factor.variables)
+            ]
+        )
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ev = ev / factor.values.sum()
+        if np.isnan(ev).any():
+            raise RuntimeError(
+                "query {} | {} generated Nan, consider imputing a random decision".format(variables, context)
+            )
         return ev.tolist()  # type: ignore
 
     def sample(self, seed: Optional[int] = None) -> Dict[str, Outcome]:
@@ -247,6 +425,9 @@ class CausalBayesianNetwork(BayesianNetwork):
         model_copy = self.copy_without_cpds()
         for v in self.model:
             model_copy.model[v] = self.model[v].copy() if hasattr(self.model[v], "copy") else self.model[v]
+        # the copy has the same graph, so the graph caches remain valid
+        model_copy._topological_order = self._topological_order
+        model_copy._ancestors = dict(self._ancestors)
         return model_copy
 
     def _get_color(self, node: str) -> Union[np.ndarray, str]:
@@ -3,6 +3,9 @@ from __future__ import annotations
 import random
 from typing import Any, Dict, Iterable, List, Optional, Tuple
 
+import networkx as nx
+from pgmpy.inference.ExactInference import BeliefPropagation
+
 from pycid.core.cpd import StochasticFunctionCPD
 from pycid.core.macid_base import MACIDBase
 
@@ -38,12 +41,27 @@ class CID(MACIDBase):
     def impute_optimal_policy(self) -> None:
         """Impute an optimal policy to all decision nodes"""
         self.impute_random_policy()
-        if self.sufficient_recall():
-            decisions = self.get_valid_order(self.decisions)
-            for d in reversed(decisions):
+        if not self.sufficient_recall():
+            self.add_cpds(*random.choice(self.optimal_policies()))
+        elif not nx.is_connected(self.to_undirected()):
+            for d in reversed(self.get_valid_order(self.decisions)):
                 self.impute_optimal_decision(d)
         else:
-            self.add_cpds(*random.choice(self.optimal_policies()))
+            # Build the junction tree once, and multiply each solved decision rule into it (dividing out the
+            # random policy it replaces), instead of building a new junction tree for every decision
+            bp = BeliefPropagation(self)
+            for d in reversed(self.get_valid_order(self.decisions)):
+                descendant_utility_nodes = self._get_descendant_utilities(d)
+                variables = descendant_utility_nodes + [d] + self.get_parents(d)
+                factor = bp._query(variables, "marginalize", show_progress=False)
+                random_factor = self.get_cpds(d).to_factor()
+                self._impute_optimal_decision(d, factor, descendant_utility_nodes)
+
+                clique = next(c for c in bp.junction_tree.nodes() if set(random_factor.scope()) <= set(c))
+                potential = bp.junction_tree.get_factors(clique)
+                bp.junction_tree.remove_factors(potential)
+                bp.junction_tree.add_factors(potential * self.get_cpds(d).to_factor() / random_factor)
+                bp.clique_beliefs = {}  # the junction tree is recalibrated on the next query
 
     def optimal_policies(self) -> List[Tuple[StochasticFunctionCPD, ...]]:
         """
@@ -50,6 +50,7 @@ class StochasticFunctionCPD(TabularCPD):
         domain: Optional[Sequence[Outcome]] = None,
         state_names: Optional[Mapping[str, List]] = None,
         label: str = None,
+        _probability_matrix: Optional[np.ndarray] = None,
     ) -> None:
         """Initialize StochasticFunctionCPD with a variable name and a stochastic function.
 
@@ -68,6 +69,9 @@ class StochasticFunctionCPD(TabularCPD):
             Must include all values this variable can take as a result of its function.
 
         label: An optional label used to describe this distribution.
+
+        _probability_matrix: The probability matrix of the function, if it has already been computed for the
+            current parent domains. The domain is then taken from state_names. Only meant for copy().
         """
         self.variable = variable
         self.func = stochastic_function
@@ -84,11 +88,39 @@ class StochasticFunctionCPD(TabularCPD):
         self.label = label if label is not None else self.compute_label(stochastic_function)
 
         self.check_function_arguments_match_parent_names()
+        if _probability_matrix is None:
+            probability_matrix = self._compute_probability_matrix()
+        else:
+            assert state_names is not None
+            self.domain: Sequence[Outcome] = list(state_names[self.variable])
+            probability_matrix = _probability_matrix
+
+        card = len(self.domain)
+        evidence = cbn.get_parents(self.variable)
+        evidence_card = [len(cbn.model.domain[p]) for p in evidence]
+        # the parent domains the probability matrix was computed for
+        self.parent_domains: Dict[str, List[Outcome]] = {p: cbn.model.domain[p] for p in evidence}
+
+        super().__init__(
+            self.variable,
+            card,
+            probability_matrix,
+            evidence,
+            evidence_card,
+            state_names=state_names if state_names is not None else {self.variable: self.domain},
+        )
+
+    def _compute_probability_matrix(self) -> np.ndarray:
+        """Evaluate the stochastic function in every parent context, and set the domain of the variable"""
+        # Enumerate the parent contexts and evaluate the function only once, and reuse the result
+        # both for inferring the domain and for filling in the probability matrix
+        distributions = [self.stochastic_function(**pv) for pv in self.parent_values()]
+        possible_values = sorted(set().union(*[d.keys() for d in distributions]))  # type: ignore
         if self.force_domain:
-            if not set(self.possible_values()).issubset(self.force_domain):
+            if not set(possible_values).issubset(self.force_domain):
                 raise ValueError("variable {} can take value outside given state_names".format(self.variable))
 
-        self.domain = self.force_domain if self.force_domain else self.possible_values()
+        self.domain = self.force_domain if self.force_domain else possible_values
 
         def complete_prob_dictionary(
             prob_dictionary: Mapping[Outcome, Union[int, float]]
@@ -101,27 +133,16 @@ class StochasticFunctionCPD(TabularCPD):
                 prob_dictionary[outcome] = missing_prob_mass / len(missing_outcomes)
             return prob_dictionary
 
-        card = len(self.domain)
-        evidence = cbn.get_parents(self.variable)
-        evidence_card = [cbn.get_cardinality(p) for p in evidence]
         probability_list = []
-        for pv in self.parent_values():
-            probabilities = complete_prob_dictionary(self.stochastic_function(**pv))
+        for distribution in distributions:
+            probabilities = complete_prob_dictionary(distribution)
             probability_list.append([probabilities[t] for t in self.domain])
-        probability_matrix = np.array(probability_list).T
+        probability_matrix: np.ndarray = np.array(probability_list).T
         if not np.allclose(probability_matrix.sum(axis=0), 1, rtol=0, atol=0.01):  # type: ignore
             raise ValueError(f"The values for {self.variable} do not sum to 1 \n{probability_matrix}")
         if (probability_matrix < 0).any() or (probability_matrix > 1).any():  # type: ignore
             raise ValueError(f"The probabilities for {self.variable} are not within range 0-1\n{probability_matrix}")
-
-        super().__init__(
-            self.variable,
-            card,
-            probability_matrix,
-            evidence,
-            evidence_card,
-            state_names=state_names if state_names is not None else {self.variable: self.domain},
-        )
+        return probability_matrix
 
     def stochastic_function(self, **pv: Outcome) -> Mapping[Outcome, float]:
         ret = self.func(**pv)
@@ -169,14 +190,15 @@ class StochasticFunctionCPD(TabularCPD):
 
     def parent_values(self) -> Iterator[Dict[str, Outcome]]:
         """Return a list of lists for the values each parent can take (based on the parent state names)"""
+        parents = self.cbn.get_parents(self.variable)
         parent_values_list = []
         try:
-            for p in self.cbn.get_parents(self.variable):
+            for p in parents:
                 parent_values_list.append(self.cbn.model.domain[p])
         except KeyError:
             raise ParentsNotReadyException(f"Parent {p} of {self.variable} not yet instantiated")
         for parent_values in itertools.product(*parent_values_list):
-            yield {p: parent_values[i] for i, p in enumerate(self.cbn.get_parents(self.variable))}
+            yield dict(zip(parents, parent_values))
 
     def possible_values(self) -> List[Outcome]:
         """The possible values this variable can take, given the values the parents can take"""
@@ -185,12 +207,23 @@ class StochasticFunctionCPD(TabularCPD):
         )
 
     def copy(self) -> StochasticFunctionCPD:
+        """Copy the CPD.
+
+        If the parent domains are unchanged, the copy reuses the already computed probability matrix instead
+        of evaluating the stochastic function again. A copy of an impure function (e.g. one that samples random
+        numbers) therefore has the same matrix as the original, rather than a newly sampled one.
+        """
+        unchanged = list(self.parent_domains.items()) == [
+            (p, self.cbn.model.domain.get(p)) for p in self.cbn.get_parents(self.variable)
+        ]
         return StochasticFunctionCPD(
             str(self.variable),
             self.func,
             self.cbn,
             domain=list(self.force_domain) if self.force_domain else None,
             state_names=self.state_names,
+            label=self.label,
+            _probability_matrix=self.get_values() if unchanged else None,
         )
 
     def __repr__(self) -> str:
@@ -2,7 +2,6 @@ from __future__ import annotations
 
 import itertools
 import math
-from functools import lru_cache
 from typing import (
     Any,
     Callable,
@@ -25,7 +24,7 @@ from warnings import warn
 import matplotlib.cm as cm
 import networkx as nx
 import numpy as np
-from pgmpy.factors.discrete import TabularCPD
+from pgmpy.factors.discrete import DiscreteFactor, TabularCPD
 from pgmpy.inference.ExactInference import BeliefPropagation
 
 from pycid.core.causal_bayesian_network import CausalBayesianNetwork, Relationship
@@ -162,26 +161,39 @@ class MACIDBase(CausalBayesianNetwork):
                 raise ValueError(f"The outcome {outcome} is not in the domain of {variable}")
 
         intervention = intervention or {}
+        self._check_policies_imputed(query, context, intervention)
+        return super().query(query, context, intervention)
 
-        # Check that strategically relevant decisions have a policy specified
-        mech_graph = MechanismGraph(self)
-        for intervention_var in intervention:
-            for parent in self.get_parents(intervention_var):
-                mech_graph.remove_edge(parent, intervention_var)
-        for decision in self.decisions:
-            for query_node in query:
-                if mech_graph.is_dconnected(
-                    decision + "mec", query_node, observed=list(context.keys()) + list(intervention.keys())
-                ):
-                    cpd = self.get_cpds(decision)
-                    if not cpd:
-                        raise ValueError(f"no DecisionDomain specified for {decision}")
-                    elif isinstance(cpd, DecisionDomain):
-                        raise ValueError(
-                            f"P({query}|{context}, do({intervention})) depends on {decision}, but no policy imputed"
-                        )
+    def _check_policies_imputed(
+        self, query: Iterable[str], context: Iterable[str], intervention: Optional[Dict[str, Outcome]] = None
+    ) -> None:
+        """Raise a ValueError if P(query|context, do(intervention)) depends on a decision without a policy.
 
-        return super().query(query, context, intervention)
+        context can be a dictionary mapping node => outcome, or just the observed nodes.
+        """
+        intervention = intervention or {}
+
+        # Check that strategically relevant decisions have a policy specified.
+        # Only decisions without a policy can fail the check, so the mechanism graph is only built for those.
+        decisions_without_policy = [
+            d for d in self.decisions if not self.get_cpds(d) or isinstance(self.get_cpds(d), DecisionDomain)
+        ]
+        if decisions_without_policy:
+            mech_graph = MechanismGraph(self)
+            for intervention_var in intervention:
+                for parent in self.get_parents(intervention_var):
+                    mech_graph.remove_edge(parent, intervention_var)
+            for decision in decisions_without_policy:
+                for query_node in query:
+                    if mech_graph.is_dconnected(
+                        decision + "mec", query_node, observed=list(context) + list(intervention.keys())
+                    ):
+                        if not self.get_cpds(decision):
+                            raise ValueError(f"no DecisionDomain specified for {decision}")
+                        else:
+                            raise ValueError(
+                                f"P({query}|{context}, do({intervention})) depends on {decision}, but no policy imputed"
+                            )
 
     def expected_utility(
         self, context: Dict[str, Outcome], intervention: Dict[str, Outcome] = None, agent: AgentLabel = 0
@@ -206,7 +218,9 @@ class MACIDBase(CausalBayesianNetwork):
         """Get a topological order of the specified set of nodes (this may not be unique).
 
         By default, a topological ordering of the decision nodes is given"""
-        if not nx.is_directed_acyclic_graph(self):
+        try:
+            order = self._get_topological_order()
+        except nx.NetworkXUnfeasible:
             raise ValueError("A topological ordering of nodes can only be returned if the (MA)CID is acyclic")
 
         if nodes is None:
@@ -217,7 +231,7 @@ class MACIDBase(CausalBayesianNetwork):
                 if node not in self.nodes:
                     raise KeyError(f"{node} is not in the (MA)CID.")
 
-        srt = [node for node in nx.topological_sort(self) if node in nodes]
+        srt = [node for node in order if node in nodes]
         return srt
 
     def is_s_reachable(self, d1: Union[str, Iterable[str]], d2: Union[str, Iterable[str]]) -> bool:
@@ -244,15 +258,29 @@ class MACIDBase(CausalBayesianNetwork):
             decisions = [decisions]
         if isinstance(nodes, str):
             nodes = [nodes]
+        r_reachable = self._get_r_reachable(decisions, nodes)
+        return any(r_reachable.values())
+
+    def _get_r_reachable(self, decisions: Iterable[str], nodes: Iterable[str]) -> Dict[str, Set[str]]:
+        """Map each decision to the subset of nodes that are r-reachable from it.
+
+        A single mechanism graph is shared between all decisions, and the active trails from each
+        descendant utility node are computed once rather than once per (decision, node) pair.
+        """
+        nodes = list(nodes)
         mg = MechanismGraph(self)
+        r_reachable: Dict[str, Set[str]] = {}
         for decision in decisions:
-            for node in nodes:
-                con_nodes = [decision] + self.get_parents(decision)
-                agent_utilities = self.agent_utilities[self.decision_agent[decision]]
-                for utility in set(agent_utilities).intersection(nx.descendants(self, decision)):
-                    if mg.is_dconnected(node + "mec", utility, con_nodes):
-                        return True
-        return False
+            con_nodes = [decision] + self.get_parents(decision)
+            agent_utilities = self.agent_utilities[self.decision_agent[decision]]
+            descendant_utilities = list(set(agent_utilities).intersection(nx.descendants(self, decision)))
+            r_reachable[decision] = set()
+            if not descendant_utilities:
+                continue
+            active_trails = mg.active_trail_nodes(descendant_utilities, observed=con_nodes)
+            connected = set().union(*active_trails.values())
+            r_reachable[decision] = {node for node in nodes if node + "mec" in connected}
+        return r_reachable
 
     def sufficient_recall(self, agent: Optional[AgentLabel] = None) -> bool:
         """
@@ -286,15 +314,20 @@ class MACIDBase(CausalBayesianNetwork):
 
         # We begin by representing each possible decision rule as a tuple of outcomes, with
         # one element for each possible decision context
-        number_of_decision_contexts = int(np.product(parent_cardinalities))
+        number_of_decision_contexts = int(np.prod(parent_cardinalities))
         functions_as_tuples = itertools.product(domain, repeat=number_of_decision_contexts)
 
+        # The index of a decision context is a mixed-radix number, with one digit per parent.
+        # The digit maps and place values are computed once, rather than on every call of arg2idx.
+        name_to_nos: List[Dict[Outcome, int]] = [self.get_cpds(parent).name_to_no[parent] for parent in parents]
+        place_values = [int(np.prod(parent_cardinalities[:i])) for i in range(len(parents))]
+
         def arg2idx(pv: Dict[str, Outcome]) -> int:
             """Convert a decision context into an index for the function list"""
-            idx = 0
-            for i, parent in enumerate(parents):
-                name_to_no: Dict[Outcome, int] = self.get_cpds(parent).name_to_no[parent]
-                idx += name_to_no[pv[parent]] * int(np.product(parent_cardinalities[:i]))
+            idx = sum(
+                name_to_no[pv[parent]] * place_value
+                for parent, name_to_no, place_value in zip(parents, name_to_nos, place_values)
+            )
             assert 0 <= idx <= number_of_decision_contexts
             return idx
 
@@ -382,32 +415,61 @@ class MACIDBase(CausalBayesianNetwork):
         """Impute an optimal policy to the given decision node"""
         # self.add_cpds(random.choice(self.optimal_pure_decision_rules(d)))
         self.impute_random_decision(decision)
-        domain = self.model.domain[decision]
+        descendant_utility_nodes = self._get_descendant_utilities(decision)
+        parents = self.get_parents(decision)
+        # The expected utilities only need to be well-defined given the decision and its parents.
+        # A single joint query then gives the expected utility of every action in every decision context.
+        self._check_policies_imputed(descendant_utility_nodes, [decision] + parents)
+        factor = super().query(descendant_utility_nodes + [decision] + parents, {})
+        self._impute_optimal_decision(decision, factor, descendant_utility_nodes)
+
+    def _get_descendant_utilities(self, decision: str) -> List[str]:
+        """The utility nodes of the decision's agent that descend from the decision"""
         utility_nodes = self.agent_utilities[self.decision_agent[decision]]
-        descendant_utility_nodes = list(set(utility_nodes).intersection(nx.descendants(self, decision)))
-        copy = self.copy()  # using a copy "freezes" the policy so it doesn't adapt to future interventions
+        return list(set(utility_nodes).intersection(nx.descendants(self, decision)))
+
+    def _impute_optimal_decision(self, decision: str, factor: DiscreteFactor, utility_nodes: List[str]) -> None:
+        """Impute the decision rule maximising the expected sum of utility_nodes, given a (possibly unnormalized)
+        factor over utility_nodes, the decision, and its parents.
+
+        The policy only looks up values precomputed from the factor, so it doesn't adapt to future interventions.
+        """
+        domain = self.model.domain[decision]
+        parents = self.get_parents(decision)
+        eu = _conditional_expectation(factor, utility_nodes, [decision] + parents)
+        # the first action whose expected utility is within rounding error of the best, for all contexts at once.
+        # The expected utilities of equally good actions may differ in their last bits, and an exact argmax would
+        # then break ties arbitrarily rather than by domain order.
+        best_actions = np.argmax(np.isclose(eu, eu.max(axis=0), rtol=1e-9, atol=1e-12), axis=0)
 
-        @lru_cache(maxsize=1000)
         def opt_policy(**parent_values: Outcome) -> Outcome:
-            eu = {}
-            for d in domain:
-                parent_values[decision] = d
-                eu[d] = sum(copy.expected_value(descendant_utility_nodes, parent_values))
-            return max(eu, key=eu.get)  # type: ignore
+            context_idx = tuple(factor.name_to_no[p][parent_values[p]] for p in parents)
+            if np.isnan(eu[(slice(None),) + context_idx]).any():
+                raise RuntimeError(
+                    f"query {utility_nodes} | {parent_values} generated Nan, consider imputing a random decision"
+                )
+            return factor.state_names[decision][best_actions[context_idx]]
 
         self.add_cpds(StochasticFunctionCPD(decision, opt_policy, self, domain=domain, label="opt"))
 
     def impute_conditional_expectation_decision(self, decision: str, y: str) -> None:
         """Imputes a policy for decision = the expectation of y conditioning on d's parents"""
         # TODO: Move to analyze, as this is not really a core feature?
-        copy = self.copy()
+        parents = self.get_parents(decision)
+        if y not in parents:
+            # The conditional expectation only needs to be well-defined given the parents.
+            # A single joint query then gives the conditional expectation of y in every decision context.
+            self._check_policies_imputed([y], parents)
+            factor = super().query([y] + parents, {})
+            cond_exp = _conditional_expectation(factor, [y], parents)
 
-        @lru_cache(maxsize=1000)
         def cond_exp_policy(**pv: Outcome) -> float:
             if y in pv:
                 return pv[y]  # type: ignore
-            else:
-                return copy.expected_value([y], pv)[0]
+            context_cond_exp = cond_exp[tuple(factor.name_to_no[p][pv[p]] for p in parents)]
+            if np.isnan(context_cond_exp):
+                raise RuntimeError(f"query {[y]} | {pv} generated Nan, consider imputing a random decision")
+            return float(context_cond_exp)
 
         self.add_cpds(**{decision: cond_exp_policy})
 
@@ -459,6 +521,22 @@ class MACIDBase(CausalBayesianNetwork):
             return "o"
 
 
+def _conditional_expectation(factor: DiscreteFactor, variables: Sequence[str], given: Sequence[str]) -> np.ndarray:
+    """Compute E[sum of variables | given] from a factor over variables and given.
+
+    The result has one axis per variable in given, indexed by the factor's state names.
+    """
+    probs = np.transpose(factor.values, [factor.variables.index(v) for v in list(given) + list(variables)])
+    # broadcast the state names of each summed variable along its own axis, instead of enumerating all cells
+    values_sum = sum(
+        np.reshape(np.asarray(factor.state_names[v], dtype=float), [-1] + [1] * (len(variables) - i - 1))
+        for i, v in enumerate(variables)
+    )
+    axes = tuple(range(len(given), probs.ndim))
+    with np.errstate(invalid="ignore"):  # contexts with probability zero give 0/0
+        return (probs * values_sum).sum(axis=axes) / probs.sum(axis=axes)  # type: ignore
+
+
 class MechanismGraph(MACIDBase):
     """A mechanism graph has an extra parent node+"mec" for each node"""
 
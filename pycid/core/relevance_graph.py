@@ -25,10 +25,11 @@ class RelevanceGraph(nx.DiGraph):
         super().__init__()
         if decisions is None:
             decisions = cid.decisions
+        decisions = list(decisions)
         self.add_nodes_from(decisions)
-        dec_pair_perms = list(itertools.permutations(decisions, 2))
-        for dec_pair in dec_pair_perms:
-            if cid.is_s_reachable(dec_pair[0], dec_pair[1]):
+        r_reachable = cid._get_r_reachable(decisions, decisions)
+        for dec_pair in itertools.permutations(decisions, 2):
+            if dec_pair[1] in r_reachable[dec_pair[0]]:
                 self.add_edge(dec_pair[0], dec_pair[1])
 
     def is_acyclic(self) -> bool:
@@ -42,6 +42,19 @@ class TestRemoveAddEdge:
             cbn.remove_edge("A", "C")  # the CPD for C relies on knowing the value of A
             assert cbn.check_model()
 
+    @staticmethod
+    def test_graph_caches(cbn_3node_uniform: CausalBayesianNetwork) -> None:
+        cbn = cbn_3node_uniform
+        assert cbn._get_ancestors_of("B") == {"A", "B"}
+        assert cbn._get_topological_order() == ["A", "B", "C"]
+        cbn.remove_edge("A", "B")  # editing the graph must invalidate the cached ancestors and order
+        assert cbn._get_ancestors_of("B") == {"B"}
+        cbn.remove_node("C")
+        assert cbn._get_topological_order() in [["A", "B"], ["B", "A"]]
+        cbn.add_edge("B", "A")
+        assert cbn._get_ancestors_of("A") == {"A", "B"}
+        assert cbn._get_topological_order() == ["B", "A"]
+
 
 class TestRemoveNode:
     @staticmethod
@@ -61,6 +74,11 @@ class TestAssignCpd:
         cpd = cbn.get_cpds("D").values
         assert np.array_equal(cpd, np.array([[1, 0], [0, 1]]))
 
+    @staticmethod
+    def test_add_unsupported_relationship(cbn_3node: CausalBayesianNetwork) -> None:
+        with pytest.raises(ValueError, match="Only TabularCPD or ContinuousFactor can be added."):
+            cbn_3node.add_cpds(U=3.0)
+
     @staticmethod
     def test_remove_cpds(cbn_3node: CausalBayesianNetwork) -> None:
         cbn_3node.remove_cpds("S")
@@ -69,6 +87,16 @@ class TestAssignCpd:
         cbn_3node.remove_cpds("D")
         cbn_3node.remove_cpds("U")
 
+    @staticmethod
+    def test_replace_cpd_in_place(cbn_3node: CausalBayesianNetwork) -> None:
+        cbn = cbn_3node
+        cbn.add_cpds(D=lambda S: S)
+        assert len(cbn.get_cpds()) == 3
+        assert cbn.get_cpds("D").domain == [-1, 1]
+        cbn.cpds.remove(cbn.get_cpds("S"))  # modifying the list directly must not confuse the lookup
+        assert cbn.get_cpds("S") is None
+        assert cbn.get_cpds("U").variable == "U"
+
 
 class TestIsStructuralCausalModel:
     @staticmethod
@@ -90,6 +118,47 @@ class TestQuery:
         cbn = CausalBayesianNetwork([("A", "B")])
         cbn.add_cpds(A=RandomCPD(), B=RandomCPD())
         cbn.query(["A"], {}, intervention={"B": 0})  # the intervention separates A and B into separare components
+        cbn.add_node("C")
+        cbn.add_cpds(C=RandomCPD())
+        cbn.query(["A"], {})
+        assert "C" in cbn.nodes  # nodes outside the queried component must not be removed from the CBN
+
+    @staticmethod
+    def test_query_cache(cbn_minimal: CausalBayesianNetwork) -> None:
+        cbn = cbn_minimal
+        factor = cbn.query(["B"], {})
+        factor.normalize()  # mutating a returned factor must not affect later queries
+        assert np.array_equal(cbn.query(["B"], {}).values, factor.values)
+        cbn.intervene({"A": 1})  # changing a CPD must invalidate the cached result
+        assert cbn.query(["B"], {}).values[1] == 1
+        idx = cbn.cpds.index(cbn.get_cpds("A"))
+        cbn.cpds[idx] = TabularCPD("A", 2, [[1], [0]], state_names={"A": [0, 1]})  # as must modifying cpds directly
+        assert cbn.query(["B"], {}).values[0] == 1
+
+    @staticmethod
+    def test_query_cache_is_bounded(cbn_fork: CausalBayesianNetwork) -> None:
+        cbn = cbn_fork
+        cbn.QUERY_CACHE_SIZE = 2
+        for a in [1, 2]:
+            cbn.query(["C"], {"A": a})
+        cbn.query(["C"], {"A": 1})  # the least recently used result is evicted first
+        cbn.query(["C"], {"B": 3})
+        assert list(cbn._query_cache) == [
+            (("C",), frozenset({("A", 1)}), frozenset()),
+            (("C",), frozenset({("B", 3)}), frozenset()),
+        ]
+
+    @staticmethod
+    def test_variable_elimination_matches_belief_propagation() -> None:
+        cbn = CausalBayesianNetwork([("A", "B"), ("A", "C"), ("B", "D"), ("C", "D")])
+        cbn.add_cpds(A=RandomCPD(seed=1), B=RandomCPD(seed=2), C=RandomCPD(seed=3), D=RandomCPD(seed=4))
+        queries = [(["D"], {}), (["B", "A"], {"D": 1}), (["C"], {"A": 0, "D": 0})]
+        factors = [cbn.query(query, context) for query, context in queries]
+        cbn.MAX_NODES_FOR_VARIABLE_ELIMINATION = 0
+        cbn._clear_query_cache()
+        for (query, context), factor in zip(queries, factors):
+            assert factor.variables == query
+            assert factor == cbn.query(query, context)
 
     @staticmethod
     def test_valid_context(cbn_3node: CausalBayesianNetwork) -> None:
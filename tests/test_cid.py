@@ -1,11 +1,11 @@
 from __future__ import annotations
 
 import sys
-from typing import TYPE_CHECKING
 
 import numpy as np
 import pytest
 
+from pycid import CID
 from pycid.examples.simple_cids import (
     get_2dec_cid,
     get_3node_cid,
@@ -15,9 +15,6 @@ from pycid.examples.simple_cids import (
 )
 from pycid.examples.story_cids import get_introduced_bias
 
-if TYPE_CHECKING:
-    from pycid import CID
-
 
 @pytest.fixture
 def cid_2dec() -> CID:
@@ -84,6 +81,33 @@ class TestSolve:
         cid_insufficient_recall.impute_optimal_policy()
         assert cid_insufficient_recall.expected_utility({}) == 1
 
+    @staticmethod
+    def test_impute_optimal_policy_matches_backward_induction(cid_2dec: CID) -> None:
+        cid = cid_2dec.copy()
+        cid.impute_random_policy()
+        for d in reversed(cid.get_valid_order()):
+            cid.impute_optimal_decision(d)
+        cid_2dec.impute_optimal_policy()
+        for d in cid.decisions:
+            assert np.array_equal(cid_2dec.get_cpds(d).values, cid.get_cpds(d).values)
+
+    @staticmethod
+    def test_optimal_decision_breaks_near_ties_by_domain_order() -> None:
+        cid = CID([("D", "U")], decisions=["D"], utilities=["U"])
+        cid.add_cpds(D=[0, 1], U=lambda D: 0.1 * 3 if D else 0.3)  # equal up to floating point error
+        cid.impute_optimal_decision("D")
+        assert cid.get_cpds("D").values[0] == 1
+
+    @staticmethod
+    def test_optimal_decision_with_unsolved_earlier_decision() -> None:
+        cid = CID([("D1", "D2"), ("D2", "U"), ("D1", "U")], decisions=["D1", "D2"], utilities=["U"])
+        cid.add_cpds(D1=[0, 1], D2=[0, 1], U=lambda D1, D2: int(D1 == D2))
+        cid.impute_optimal_decision("D2")  # D1 is observed by D2, so it doesn't need a policy
+        assert np.array_equal(cid.get_cpds("D2").values, np.eye(2))
+        cid.remove_edge("D1", "D2")
+        with pytest.raises(ValueError):
+            cid.impute_optimal_decision("D2")
+
     @staticmethod
     def test_scaled_utility(cid_5node_scaled_utility: CID) -> None:
         cid_5node_scaled_utility.impute_random_policy()
@@ -97,6 +121,17 @@ class TestConditionalExpectationDecision:
         eu_ce = cid_introduced_bias.expected_utility({})
         assert eu_ce == pytest.approx(-0.1666, abs=1e-2)
 
+    @staticmethod
+    def test_cond_expectation_decision_with_unsolved_earlier_decision() -> None:
+        cid = CID(
+            [("X", "W"), ("X", "D2"), ("D1", "D2"), ("D2", "U"), ("W", "U")], decisions=["D1", "D2"], utilities=["U"]
+        )
+        cid.add_cpds(X={0: 0.5, 1: 0.5}, W=lambda X: X, D1=[0, 1], D2=[0, 1], U=lambda D2, W: D2 * W)
+        cid.impute_conditional_expectation_decision("D2", "W")  # D1 is observed by D2, so it doesn't need a policy
+        for x in [0, 1]:
+            for d1 in [0, 1]:
+                assert cid.get_cpds("D2").stochastic_function(X=x, D1=d1) == {x: 1}
+
 
 if __name__ == "__main__":
     pytest.main(sys.argv)
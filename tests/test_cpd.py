@@ -32,6 +32,23 @@ class TestCPD(unittest.TestCase):
         self.assertEqual(cpd_b.get_cardinality(["B"])["B"], 1)
         self.assertEqual(cpd_b.get_state_names("B", 0), 2)
 
+    def test_copy_function_cpd(self) -> None:
+        cid = get_minimal_cid()
+        cid.add_cpds(A=lambda: 2)
+        noise = [0.1]
+        cpd_b = StochasticFunctionCPD("B", lambda A: {A: 1 - noise[0], 0: noise[0]}, cid, label="noisy")
+        cid.add_cpds(cpd_b)
+        noise[0] = 0.5  # the function is impure, but copies reuse the probability matrix rather than re-evaluating it
+        cpd_b_copy = cpd_b.copy()
+        self.assertEqual(cpd_b_copy, cpd_b)
+        self.assertEqual(cpd_b_copy.get_value(B=0, A=2), 0.1)
+        self.assertEqual(cpd_b_copy.label, "noisy")
+        self.assertIsNot(cpd_b_copy.values, cpd_b.values)
+        cid.add_cpds(A={1: 0.5, 2: 0.5})  # the parent domain has changed, so the function is evaluated anew
+        cpd_b_copy = cpd_b.copy()
+        self.assertEqual(cpd_b_copy.get_cardinality(["A"])["A"], 2)
+        self.assertEqual(cpd_b_copy.get_value(B=0, A=2), 0.5)
+
     def test_updated_decision_names(self) -> None:
         cid = get_introduced_bias()
         self.assertEqual(cid.get_cpds("D").state_names["D"], [0, 1])